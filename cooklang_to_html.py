@@ -4,10 +4,76 @@ CookLang to HTML Recipe Converter
 Converts .cook files to HTML pages for Cristian's website
 """
 
+import datetime
+import functools
+import hashlib
+import inspect
+import json
+import os
+import random
 import re
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+from html import escape
 from pathlib import Path
 
+SITE_DIR = Path(__file__).resolve().parent
+
+# CookLang markup: @name{quantity%unit}{notes} and #tool{}
+INGREDIENT_PATTERN = re.compile(r'@([^{]+)\{([^}]*)\}(?:\{([^}]*)\})?')
+TOOL_PATTERN = re.compile(r'#([^{]+)\{\}')
+
+# Hand-written pages and assets that go into the precache alongside generated recipes
+STATIC_ASSETS = ['index.html', 'cooking.html', 'styles.css', 'script.js']
+PRECACHE_MANIFEST = 'precache-manifest.json'
+SERVICE_WORKER = 'sw.js'
+
+# Aggregate outputs (card grid, sitemap, feed) and the graph of recipe fields they consume
+SITE_URL = 'https://cristianvill.github.io/'
+# Committed: it holds the dates shown in feed.xml, which must survive fresh clones
+BUILD_GRAPH = '.build-graph.json'
+CARD_GRID_START = '<!-- recipe cards: generated by cooklang_to_html.py -->'
+CARD_GRID_END = '<!-- end of generated recipe cards -->'
+# Worker mode (--worker): JSON-lines requests on stdin, responses on stdout
+WORKER_THREADS = 4
+PARSE_CACHE_SIZE = 256
+KNOWN_SECTIONS = {'Portioning Guide', 'Ingredients', 'Tools', 'Instructions', 'Tips'}
+# One quantity: "2", "1.5", "1/4" or a mixed number "1 1/2"
+# Leading quantity or range of a ">> servings:" value, e.g. "1-2" or "4" in "4 people"
+SERVINGS_PATTERN = re.compile(r'([\d\s/.-]*\d)(.*)')
+QUANTITY_PATTERN = re.compile(r'(?:(\d+)\s+(?=\d+/))?(\d+(?:\.\d+)?)(?:/(\d+))?')
+
+# Related recipes: MinHash signatures bucketed with locality-sensitive hashing
+RELATED_CACHE = '.related-cache.json'
+RELATED_COUNT = 3
+MINHASH_PERMUTATIONS = 128
+# 32 bands of 4 rows: the S-curve threshold (1/32)^(1/4) is a Jaccard similarity of
+# ~0.42. Pairs at 0.5 meet in a bucket 87% of the time, pairs at 0.3 23%, and
+# unrelated pairs (~0.1) 0.3%, so candidate sets stay a small slice of the corpus.
+LSH_BANDS = 32
+MERSENNE_PRIME = (1 << 61) - 1
+
+# Pantry staples and everyday tools say nothing about how recipes relate and,
+# being in almost every recipe, would put everything in the same LSH buckets
+STAPLE_FEATURES = {
+    'ingredient:salt', 'ingredient:pepper', 'ingredient:black pepper',
+    'ingredient:olive oil', 'ingredient:oil', 'ingredient:vegetable oil',
+    'ingredient:butter', 'ingredient:unsalted butter', 'ingredient:water',
+    'ingredient:garlic', 'ingredient:sugar', 'ingredient:kosher salt',
+    'tool:pan', 'tool:pot', 'tool:knife', 'tool:cutting board', 'tool:bowl',
+    'tool:wooden spoon', 'tool:spatula',
+}
+
+# Quantity words dropped when reducing an ingredient line to its name
+INGREDIENT_FILLER_WORDS = {
+    'g', 'kg', 'mg', 'ml', 'l', 'oz', 'lb', 'lbs', 'cup', 'cups', 'tbsp', 'tsp',
+    'tablespoon', 'tablespoons', 'teaspoon', 'teaspoons', 'pinch', 'clove', 'cloves',
+    'sprig', 'sprigs', 'head', 'bunch', 'handful', 'can', 'cans', 'whole',
+    'small', 'medium', 'large', 'of',
+}
+
 def parse_cooklang(content):
     """Parse a CookLang file and extract metadata, ingredients, tools, and steps."""
     lines = content.split('\n')
@@ -52,14 +118,14 @@ def parse_cooklang(content):
             # Extract from CookLang format
             clean_line = line
             # Remove CookLang markup but keep the info
-            clean_line = re.sub(r'@([^{]+)\{([^}]*)\}(?:\{([^}]*)\})?', lambda m: format_ingredient(m), clean_line)
+            clean_line = INGREDIENT_PATTERN.sub(lambda m: format_ingredient(m), clean_line)
             if clean_line:
                 ingredients.append(clean_line)
         
         elif current_section == "Tools":
             # Remove the leading dash and extract tool name
             line = line.lstrip('- ').strip()
-            tool_match = re.search(r'#([^{]+)\{\}', line)
+            tool_match = TOOL_PATTERN.search(line)
             if tool_match:
                 tools.append(tool_match.group(1).strip())
         
@@ -297,336 +363,25 @@ def generate_html(recipe_data, output_file):
             line-height: 1.7;
             margin-bottom: 0.5rem;
         }}
-    </style>
-</head>
-<body class="cooking-page">
-    <nav class="navbar cooking-nav">
-        <div class="nav-container">
-            <div class="nav-brand"><a href="index.html">Cristian Villatoro</a></div>
-            <ul class="nav-menu">
-                <li><a href="cooking.html">← Back to Cooking</a></li>
-            </ul>
-        </div>
-    </nav>
-
-    <div class="container">
-        <article class="recipe-detail">
-            <a href="cooking.html#recipes" class="back-link">← All Recipes</a>
-            
-            <div class="recipe-header">
-                <h1>{title}</h1>
-                <p class="recipe-intro">{recipe_data['intro']}</p>
-                
-                <div class="recipe-stats">
-                    <div class="stat">
-                        <span class="stat-label">Prep Time</span>
-                        <span class="stat-value">{prep_time}</span>
-                    </div>
-                    <div class="stat">
-                        <span class="stat-label">Cook Time</span>
-                        <span class="stat-value">{cook_time}</span>
-                    </div>
-                    <div class="stat">
-                        <span class="stat-label">Total Time</span>
-                        <span class="stat-value">{total_time}</span>
-                    </div>
-                    <div class="stat">
-                        <span class="stat-label">Servings</span>
-                        <span class="stat-value">{servings}</span>
-                    </div>
-                </div>
-            </div>
-'''
-    
-    # Add portioning guide if present
-    if recipe_data['portioning_guide']:
-        html += '''
-            <div class="portioning-guide">
-                <h3>🧮 Portioning Guide</h3>
-'''
-        for line in recipe_data['portioning_guide']:
-            html += f'                <p>{line}</p>\n'
-        html += '            </div>\n'
-    
-    # Ingredients section
-    html += '''
-            <section class="recipe-section">
-                <h2>Ingredients</h2>
-                <ul class="ingredients-list">
-'''
-    for ingredient in recipe_data['ingredients']:
-        html += f'                    <li>{ingredient}</li>\n'
-    
-    html += '''                </ul>
-            </section>
-'''
-    
-    # Instructions section
-    html += '''
-            <section class="recipe-section">
-                <h2>Instructions</h2>
-                <ol class="instructions-list">
-'''
-    for step in recipe_data['steps']:
-        html += f'                    <li>{step}</li>\n'
-    
-    html += '''                </ol>
-            </section>
-'''
-    
-    # Tips section
-    if recipe_data['tips']:
-        html += '''
-            <div class="recipe-notes">
-                <h3>✨ Tips</h3>
-                <ul>
-'''
-        for tip in recipe_data['tips']:
-            html += f'                    <li>{tip}</li>\n'
-        html += '''                </ul>
-            </div>
-'''
-    
-    html += '''        </article>
-    </div>
-
-    <footer class="cooking-footer">
-        <div class="container">
-            <p><a href="cooking.html">← Back to all recipes</a></p>
-        </div>
-    </footer>
-</body>
-</html>
-'''
-    
-    return html
-
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python cooklang_to_html.py recipe.cook")
-        print("Output: recipe.html")
-        sys.exit(1)
-    
-    input_file = Path(sys.argv[1])
-    
-    if not input_file.exists():
-        print(f"Error: File '{input_file}' not found")
-        sys.exit(1)
-    
-    # Read CookLang file
-    with open(input_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Parse recipe
-    recipe_data = parse_cooklang(content)
-    
-    # Generate HTML
-    html = generate_html(recipe_data, input_file.stem)
-    
-    # Write output
-    output_file = input_file.with_suffix('.html')
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html)
-    
-    print(f"✅ Converted {input_file} → {output_file}")
-    print(f"📊 Ingredients: {len(recipe_data['ingredients'])}")
-    print(f"🔧 Tools: {len(recipe_data['tools'])}")
-    print(f"📝 Steps: {len(recipe_data['steps'])}")
-
-if __name__ == "__main__":
-    main()
-
 
-def generate_html(recipe_data, output_file):
-    """Generate HTML from parsed recipe data."""
-    
-    meta = recipe_data['metadata']
-    title = meta.get('title', 'Recipe')
-    source = meta.get('source', 'Cristian Villatoro')
-    servings = meta.get('servings', '2-4')
-    total_time = meta.get('time', '30 minutes')
-    
-    # Calculate rough prep/cook time (you can adjust this logic)
-    prep_time = "15 minutes"
-    cook_time = total_time
-    
-    html = f'''<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{title} - Cristian Villatoro</title>
-    <link rel="stylesheet" href="styles.css">
-    <style>
-        .recipe-detail {{
-            max-width: 800px;
-            margin: 0 auto;
-        }}
-        
-        .recipe-header {{
-            padding: 3rem 0 2rem;
-            border-bottom: 2px solid var(--cooking-secondary);
-            margin-bottom: 2rem;
-        }}
-        
-        .recipe-header h1 {{
-            font-family: var(--font-serif);
-            font-size: 2.5rem;
-            color: var(--cooking-dark);
-            margin-bottom: 1rem;
-        }}
-        
-        .recipe-intro {{
-            color: var(--text-medium);
-            font-size: 1.1rem;
-            line-height: 1.7;
-            margin-bottom: 1.5rem;
-        }}
-        
-        .recipe-stats {{
-            display: flex;
-            gap: 2rem;
-            flex-wrap: wrap;
-            padding: 1.5rem;
-            background-color: var(--cooking-bg);
-            border-radius: 8px;
-        }}
-        
-        .stat {{
-            display: flex;
-            flex-direction: column;
-        }}
-        
-        .stat-label {{
-            font-size: 0.85rem;
-            color: var(--text-light);
-            text-transform: uppercase;
-            letter-spacing: 0.05em;
-            margin-bottom: 0.25rem;
-        }}
-        
-        .stat-value {{
-            font-size: 1.1rem;
-            color: var(--cooking-dark);
-            font-weight: 600;
-        }}
-        
-        .recipe-section {{
-            margin: 3rem 0;
-        }}
-        
-        .recipe-section h2 {{
-            font-size: 1.75rem;
-            color: var(--cooking-dark);
-            margin-bottom: 1rem;
-            border-bottom: 2px solid var(--cooking-secondary);
-            padding-bottom: 0.5rem;
-        }}
-        
-        .ingredients-list {{
+        .related-list {{
             list-style: none;
             padding: 0;
         }}
-        
-        .ingredients-list li {{
+
+        .related-list li {{
             padding: 0.75rem;
             border-bottom: 1px solid var(--border-color);
-            color: var(--text-dark);
         }}
-        
-        .ingredients-list li:hover {{
-            background-color: var(--cooking-bg);
-        }}
-        
-        .instructions-list {{
-            list-style: none;
-            counter-reset: step-counter;
-            padding: 0;
-        }}
-        
-        .instructions-list li {{
-            counter-increment: step-counter;
-            position: relative;
-            padding: 1.5rem 0 1.5rem 4rem;
-            border-bottom: 1px solid var(--border-color);
-            color: var(--text-dark);
-            line-height: 1.7;
-        }}
-        
-        .instructions-list li:before {{
-            content: counter(step-counter);
-            position: absolute;
-            left: 0;
-            top: 1.25rem;
-            width: 2.5rem;
-            height: 2.5rem;
-            background-color: var(--cooking-primary);
-            color: white;
-            border-radius: 50%;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            font-weight: 600;
-            font-size: 1.1rem;
-        }}
-        
-        .recipe-notes {{
-            background-color: var(--cooking-bg);
-            padding: 1.5rem;
-            border-left: 4px solid var(--cooking-secondary);
-            border-radius: 4px;
-            margin: 2rem 0;
-        }}
-        
-        .recipe-notes h3 {{
-            color: var(--cooking-dark);
-            margin-bottom: 0.75rem;
-            font-size: 1.2rem;
-        }}
-        
-        .recipe-notes p, .recipe-notes ul {{
-            color: var(--text-medium);
-            line-height: 1.7;
-            margin-bottom: 0.75rem;
-        }}
-        
-        .recipe-notes ul {{
-            padding-left: 1.5rem;
-        }}
-        
-        .recipe-notes p:last-child {{
-            margin-bottom: 0;
-        }}
-        
-        .back-link {{
-            display: inline-block;
-            margin-bottom: 2rem;
+
+        .related-list a {{
             color: var(--cooking-primary);
             text-decoration: none;
             font-weight: 500;
         }}
-        
-        .back-link:hover {{
-            text-decoration: underline;
-        }}
-
-        .portioning-guide {{
-            background-color: var(--bg-light);
-            padding: 1.5rem;
-            border-radius: 8px;
-            margin: 2rem 0;
-        }}
-
-        .portioning-guide h3 {{
-            color: var(--cooking-dark);
-            margin-bottom: 1rem;
-            font-size: 1.2rem;
-        }}
 
-        .portioning-guide p {{
-            color: var(--text-medium);
-            line-height: 1.7;
-            margin-bottom: 0.5rem;
+        .related-list a:hover {{
+            text-decoration: underline;
         }}
     </style>
 </head>
@@ -709,7 +464,7 @@ def generate_html(recipe_data, output_file):
     if recipe_data['tips']:
         html += '''
             <div class="recipe-notes">
-                <h3>✨ Final Tips</h3>
+                <h3>✨ Tips</h3>
                 <ul>
 '''
         for tip in recipe_data['tips']:
@@ -718,6 +473,19 @@ def generate_html(recipe_data, output_file):
             </div>
 '''
     
+    # Related recipes section
+    if recipe_data.get('related'):
+        html += '''
+            <section class="recipe-section">
+                <h2>Related Recipes</h2>
+                <ul class="related-list">
+'''
+        for related_title, href in recipe_data['related']:
+            html += f'                    <li><a href="{href}">{related_title}</a></li>\n'
+        html += '''                </ul>
+            </section>
+'''
+    
     html += '''        </article>
     </div>
 
@@ -726,43 +494,754 @@ def generate_html(recipe_data, output_file):
             <p><a href="cooking.html">← Back to all recipes</a></p>
         </div>
     </footer>
+
+    <script src="script.js"></script>
 </body>
 </html>
 '''
     
     return html
 
+def recipe_key(input_file):
+    """Site-relative path of a .cook file, used to key build caches."""
+    return Path(os.path.relpath(Path(input_file).resolve(), SITE_DIR)).as_posix()
+
+def load_site_recipes(recipes):
+    """Parse every .cook file in the site into `recipes`; returns {key: .cook path}.
+
+    Site-wide outputs always cover the whole tree, however few files were
+    named on the command line; build caches only decide what is stale.
+    """
+    keys = {recipe_key(input_file): input_file for input_file in recipes}
+    for cook_file in sorted(SITE_DIR.glob('*.cook')):
+        key = recipe_key(cook_file)
+        if key not in keys:
+            with open(cook_file, 'r', encoding='utf-8') as f:
+                recipes[cook_file] = parse_cooklang(f.read())
+            keys[key] = cook_file
+    return keys
+
+def ingredient_name(ingredient):
+    """Reduce a formatted ingredient line ("2-3 tbsp olive oil, high quality") to its name."""
+    name = ingredient.split(',')[0]
+    name = re.sub(r'\([^)]*\)', ' ', name).lower()
+    words = [word for word in re.findall(r"[^\W\d_][\w'-]*", name)]
+    while words and words[0] in INGREDIENT_FILLER_WORDS:
+        words.pop(0)
+    return ' '.join(words)
+
+def recipe_features(recipe_data):
+    """Set of ingredient and tool names compared when looking for related recipes."""
+    features = {f"ingredient:{ingredient_name(line)}" for line in recipe_data['ingredients']}
+    features |= {f"tool:{tool.lower()}" for tool in recipe_data['tools']}
+    features.discard('ingredient:')
+    return features - STAPLE_FEATURES
+
+def _minhash_params():
+    rng = random.Random(MINHASH_PERMUTATIONS)
+    return [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(MERSENNE_PRIME))
+            for _ in range(MINHASH_PERMUTATIONS)]
+
+MINHASH_PARAMS = _minhash_params()
+
+def minhash_signature(features):
+    """MinHash signature of a feature set (one minimum per hash permutation)."""
+    values = [int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+              for feature in features]
+    return [min((a * value + b) % MERSENNE_PRIME for value in values) for a, b in MINHASH_PARAMS]
+
+def lsh_bands(signature):
+    """Band keys for a signature; recipes sharing any band key are candidate neighbours."""
+    rows = MINHASH_PERMUTATIONS // LSH_BANDS
+    return [f"{band}:" + ','.join(map(str, signature[band * rows:(band + 1) * rows]))
+            for band in range(LSH_BANDS)]
+
+def lsh_candidates(key, signature, buckets):
+    """Recipes sharing at least one LSH bucket with `key`."""
+    candidates = set()
+    for band in lsh_bands(signature):
+        candidates.update(buckets.get(band, ()))
+    candidates.discard(key)
+    return candidates
+
+def top_related(scored):
+    """Best RELATED_COUNT of [key, similarity] pairs; ties go to the smaller key."""
+    return sorted(scored, key=lambda pair: (-pair[1], pair[0]))[:RELATED_COUNT]
+
+def find_related(recipes, cache):
+    """Pick the top related recipes for each recipe, reusing cached work where possible.
+
+    `recipes` maps a recipe key to its feature set and `cache` holds the
+    signatures and [key, similarity] neighbour lists from the previous
+    build. Only recipes whose features changed are scored against their
+    LSH candidates; the similarities found are merged into the cached
+    lists of the other recipes. A cached list is rebuilt from its own
+    candidates only when it loses an entry (a neighbour was removed, got
+    less similar or left its buckets), since the next-best recipe is not
+    known then. Returns the new cache.
+    """
+    old = cache.get('recipes', {})
+    entries = {}
+    changed = set()
+
+    for key, features in recipes.items():
+        digest = content_hash('\n'.join(sorted(features)))
+        entry = old.get(key)
+        if entry and entry['features'] == digest:
+            entries[key] = dict(entry)
+        else:
+            signature = minhash_signature(features) if features else []
+            entries[key] = {'features': digest, 'signature': signature, 'related': []}
+            changed.add(key)
+    stale = changed | (set(old) - set(recipes))
+
+    buckets = {}
+    for key, entry in entries.items():
+        if entry['signature']:
+            for band in lsh_bands(entry['signature']):
+                buckets.setdefault(band, []).append(key)
+
+    def similarity(key, other):
+        features, other_features = recipes[key], recipes[other]
+        return len(features & other_features) / len(features | other_features)
+
+    def score(key):
+        if not entries[key]['signature']:
+            return []
+        scored = [[other, similarity(key, other)]
+                  for other in lsh_candidates(key, entries[key]['signature'], buckets)]
+        return top_related([pair for pair in scored if pair[1] > 0])
+
+    # Changed recipes: score against their candidates, remember the pairs for the others
+    found = {}
+    for key in changed:
+        entries[key]['related'] = score(key)
+        if entries[key]['signature']:
+            for other in lsh_candidates(key, entries[key]['signature'], buckets):
+                if other not in changed:
+                    found.setdefault(other, {})[key] = similarity(key, other)
+
+    # Unchanged recipes: merge new pairs into the cached list, or rebuild it if it lost one
+    for key, entry in entries.items():
+        if key in changed:
+            continue
+        new_pairs = found.get(key, {})
+        related = []
+        rebuild = False
+        for other, old_similarity in entry['related']:
+            if other not in stale:
+                related.append([other, old_similarity])
+            elif new_pairs.get(other, 0) < old_similarity:
+                rebuild = True
+                break
+        if rebuild:
+            entry['related'] = score(key)
+        elif new_pairs:
+            related += [[other, value] for other, value in new_pairs.items() if value > 0]
+            entry['related'] = top_related(related)
+
+    return {'recipes': entries}
+
+def add_related(recipes):
+    """Attach (title, href) links to related recipes to each parsed recipe.
+
+    `recipes` maps .cook paths to parsed recipe data. The other .cook files
+    in the site are parsed and added to `recipes` so links stay site-wide;
+    signatures and neighbours are cached in RELATED_CACHE. Returns the
+    .cook files whose related links changed.
+    """
+    cache_file = SITE_DIR / RELATED_CACHE
+    cache = {}
+    if cache_file.exists():
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    if cache.get('settings') != [MINHASH_PERMUTATIONS, LSH_BANDS, RELATED_COUNT]:
+        cache = {}
+    old = cache.get('recipes', {})
+
+    keys = load_site_recipes(recipes)
+
+    features = {key: recipe_features(recipes[input_file]) for key, input_file in keys.items()}
+    cache = find_related(features, cache)
+    cache['settings'] = [MINHASH_PERMUTATIONS, LSH_BANDS, RELATED_COUNT]
+
+    retitled = set()
+    for key, input_file in keys.items():
+        title = recipes[input_file]['metadata'].get('title', 'Recipe')
+        cache['recipes'][key]['title'] = title
+        if old.get(key, {}).get('title') != title:
+            retitled.add(key)
+    write_if_changed(cache_file, json.dumps(cache) + '\n')
+
+    changed = set()
+    for key, input_file in keys.items():
+        related = [other for other, _ in cache['recipes'][key]['related']]
+        old_related = [other for other, _ in old.get(key, {}).get('related', [])]
+        if related != old_related or retitled & set(related):
+            changed.add(input_file)
+
+        recipes[input_file]['related'] = related_links(input_file, cache['recipes'])
+
+    return changed
+
+def related_links(input_file, entries):
+    """(title, href) pairs for a recipe's related recipes, from RELATED_CACHE entries."""
+    page_dir = Path(input_file).resolve().parent
+    links = []
+    for other, _ in entries.get(recipe_key(input_file), {}).get('related', []):
+        href = Path(os.path.relpath((SITE_DIR / other).with_suffix('.html'), page_dir)).as_posix()
+        links.append((entries[other].get('title', 'Recipe'), href))
+    return links
+
+SERVICE_WORKER_TEMPLATE = """// Generated by cooklang_to_html.py from precache-manifest.json. Do not edit by hand.
+const CACHE_NAME = 'recipes-precache';
+const HASHES_KEY = '__precache-hashes__';
+const MANIFEST = __MANIFEST__;
+
+const toUrl = path => new URL(path, self.registration.scope).href;
+
+// Fetch only the entries whose content hash differs from what is already cached
+async function refreshChanged() {
+    const cache = await caches.open(CACHE_NAME);
+    const stored = await cache.match(HASHES_KEY);
+    const hashes = stored ? await stored.json() : {};
+
+    await Promise.all(Object.entries(MANIFEST).map(async ([path, hash]) => {
+        if (hashes[path] === hash && await cache.match(toUrl(path))) {
+            return;
+        }
+        const response = await fetch(toUrl(path), { cache: 'reload' });
+        if (response.ok) {
+            await cache.put(toUrl(path), response);
+            hashes[path] = hash;
+        }
+    }));
+
+    for (const path of Object.keys(hashes)) {
+        if (!(path in MANIFEST)) {
+            delete hashes[path];
+            await cache.delete(toUrl(path));
+        }
+    }
+    await cache.put(HASHES_KEY, new Response(JSON.stringify(hashes)));
+}
+
+self.addEventListener('install', event => {
+    // Runs in the background while the previous worker keeps serving pages
+    event.waitUntil(refreshChanged().then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(self.clients.claim());
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET' || !request.url.startsWith(self.registration.scope)) {
+        return;
+    }
+
+    let path = new URL(request.url).pathname.slice(new URL(self.registration.scope).pathname.length);
+    if (path === '') {
+        path = 'index.html';
+    }
+    if (!(path in MANIFEST)) {
+        return;
+    }
+
+    // Cache first; changed entries are refreshed when a new worker installs
+    event.respondWith(caches.open(CACHE_NAME).then(async cache => {
+        const cached = await cache.match(toUrl(path));
+        if (cached) {
+            return cached;
+        }
+        const response = await fetch(request);
+        if (response.ok) {
+            cache.put(toUrl(path), response.clone());
+        }
+        return response;
+    }));
+});
+"""
+
+def content_hash(data):
+    """Short content hash used to version precached files."""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()[:16]
+
+def write_if_changed(path, content):
+    """Write a text file only if its content changed, so unchanged outputs keep their mtime."""
+    path = Path(path)
+    if path.exists() and path.read_text(encoding='utf-8') == content:
+        return False
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return True
+
+def write_precache(pages):
+    """Update the precache manifest and service worker for the pages written by this build.
+
+    `pages` maps output paths to the HTML just generated. Entries for recipe
+    pages generated by earlier runs are kept, so an incremental build only
+    changes the hashes of pages whose content actually changed.
+    """
+    manifest_file = SITE_DIR / PRECACHE_MANIFEST
+    manifest = {}
+    if manifest_file.exists():
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+    # Drop entries whose files have been removed from the site
+    manifest = {path: digest for path, digest in manifest.items() if (SITE_DIR / path).exists()}
+
+    for name in STATIC_ASSETS:
+        asset = SITE_DIR / name
+        if asset.exists():
+            manifest[name] = content_hash(asset.read_bytes())
+
+    for output_file, html in pages.items():
+        try:
+            path = Path(output_file).resolve().relative_to(SITE_DIR).as_posix()
+        except ValueError:
+            print(f"⚠️  {output_file} is outside the site, not precached")
+            continue
+        manifest[path] = content_hash(html)
+
+    manifest = dict(sorted(manifest.items()))
+    manifest_json = json.dumps(manifest, indent=2) + '\n'
+    changed = write_if_changed(manifest_file, manifest_json)
+    service_worker = SERVICE_WORKER_TEMPLATE.replace('__MANIFEST__', manifest_json.strip())
+    changed = write_if_changed(SITE_DIR / SERVICE_WORKER, service_worker) or changed
+
+    return manifest, changed
+
+def card_fields(recipe_data, href):
+    """Fields shown on a recipe's card in the cooking.html grid."""
+    meta = recipe_data['metadata']
+    return {
+        'href': href,
+        'title': meta.get('title', 'Recipe'),
+        'description': meta.get('description', recipe_data['intro']),
+        'category': meta.get('category', ''),
+        'image': meta.get('image', ''),
+        'time': meta.get('card_time', meta.get('time', '30 minutes')),
+        'servings': meta.get('servings', '2-4'),
+    }
+
+def render_card(fields, updated):
+    """Render one recipe card for the cooking.html grid."""
+    html = f'                <div class="recipe-card" data-category="{fields["category"]}">\n'
+    if fields['image']:
+        html += f"""                    <div class="recipe-image">
+                        <img src="{fields['image']}" alt="{fields['title']}">
+                    </div>
+"""
+    html += f"""                    <div class="recipe-content">
+                        <h3>{fields['title']}</h3>
+                        <p class="recipe-description">{fields['description']}</p>
+                        <div class="recipe-meta">
+                            <span>🕐 {fields['time']}</span>
+                            <span>👥 {fields['servings']} servings</span>
+                        </div>
+                        <a href="{fields['href']}" class="recipe-link">View Recipe →</a>
+                    </div>
+                </div>
+"""
+    return html
+
+def write_card_grid(entries):
+    """Splice the cards into cooking.html between the generated-cards markers."""
+    cooking_file = SITE_DIR / 'cooking.html'
+    if not cooking_file.exists():
+        return False
+    page = cooking_file.read_text(encoding='utf-8')
+    start = page.find(CARD_GRID_START)
+    end = page.find(CARD_GRID_END)
+    if start == -1 or end == -1:
+        print("⚠️  cooking.html has no generated-cards markers, card grid not updated")
+        return False
+
+    cards = '\n'.join(entry['fragment'] for entry in entries)
+    page = page[:start + len(CARD_GRID_START)] + '\n' + cards + '                ' + page[end:]
+    return write_if_changed(cooking_file, page)
+
+def sitemap_fields(recipe_data, href):
+    """Fields a recipe contributes to sitemap.xml."""
+    return {'href': href}
+
+def render_sitemap_url(fields, updated):
+    """Render one <url> entry of sitemap.xml."""
+    return f"  <url><loc>{escape(SITE_URL + fields['href'])}</loc></url>\n"
+
+def hand_written_pages():
+    """Top-level pages that no .cook file generates (index, cooking, musings, old recipes)."""
+    return sorted(page.name for page in SITE_DIR.glob('*.html') if not page.with_suffix('.cook').exists())
+
+def write_sitemap(entries):
+    """Write sitemap.xml for the hand-written pages and every recipe page."""
+    xml = '<?xml version="1.0" encoding="UTF-8"?>\n'
+    xml += '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    for page in hand_written_pages():
+        xml += render_sitemap_url({'href': page}, None)
+    xml += ''.join(entry['fragment'] for entry in entries)
+    xml += '</urlset>\n'
+    return write_if_changed(SITE_DIR / 'sitemap.xml', xml)
+
+def feed_fields(recipe_data, href):
+    """Fields a recipe contributes to the Atom feed."""
+    meta = recipe_data['metadata']
+    return {
+        'href': href,
+        'title': meta.get('title', 'Recipe'),
+        'summary': recipe_data['intro'],
+        'date': meta.get('date', ''),
+    }
+
+def render_feed_entry(fields, updated):
+    """Render one Atom <entry>; `updated` is the day its feed fields last changed."""
+    url = escape(SITE_URL + fields['href'])
+    return f"""  <entry>
+    <title>{escape(fields['title'])}</title>
+    <link href="{url}"/>
+    <id>{url}</id>
+    <updated>{fields['date'] or updated}T00:00:00Z</updated>
+    <summary type="html">{escape(fields['summary'])}</summary>
+  </entry>
+"""
+
+def write_feed(entries):
+    """Write feed.xml with the most recently changed recipes first."""
+    entries = sorted(entries, key=lambda entry: entry['updated'], reverse=True)
+    updated = entries[0]['updated'] if entries else '1970-01-01'
+    xml = f"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <title>Recipes - Cristian Villatoro</title>
+  <link href="{SITE_URL}cooking.html"/>
+  <link rel="self" href="{SITE_URL}feed.xml"/>
+  <id>{SITE_URL}cooking.html</id>
+  <updated>{updated}T00:00:00Z</updated>
+"""
+    xml += ''.join(entry['fragment'] for entry in entries)
+    xml += '</feed>\n'
+    return write_if_changed(SITE_DIR / 'feed.xml', xml)
+
+def no_site_inputs():
+    """For aggregates that read nothing from the site besides recipes."""
+    return None
+
+# Each aggregate output: (fields it reads from a recipe, fragment renderer, writer,
+# other site inputs the writer reads)
+AGGREGATES = {
+    'cooking.html': (card_fields, render_card, write_card_grid, no_site_inputs),
+    'sitemap.xml': (sitemap_fields, render_sitemap_url, write_sitemap, hand_written_pages),
+    'feed.xml': (feed_fields, render_feed_entry, write_feed, no_site_inputs),
+}
+
+def aggregate_version(fields_for, render, write, site_inputs):
+    """Hash of the code, settings and site inputs that shape an aggregate beyond its recipe fields."""
+    source = ''.join(inspect.getsource(function) for function in (fields_for, render, write))
+    return content_hash(source + SITE_URL + json.dumps(site_inputs()))
+
+def update_aggregates(recipes):
+    """Regenerate the aggregate outputs whose inputs changed; returns their names.
+
+    The build graph in BUILD_GRAPH records, for every aggregate and recipe,
+    a fingerprint of the fields that aggregate reads and the fragment
+    rendered from them. Edits to anything else (a step, an ingredient) leave
+    the fingerprints alone, so the aggregate is not touched at all; when a
+    fingerprint does change only that recipe's fragment is re-rendered.
+    Which recipes exist always comes from the tree, never from the graph.
+    When the renderer itself changes (see aggregate_version) every fragment
+    is re-rendered, keeping the dates already recorded for the feed.
+    """
+    graph_file = SITE_DIR / BUILD_GRAPH
+    graph = {}
+    if graph_file.exists():
+        with open(graph_file, 'r', encoding='utf-8') as f:
+            graph = json.load(f)
+
+    keys = load_site_recipes(recipes)
+    today = datetime.date.today().isoformat()
+    regenerated = []
+
+    for name, (fields_for, render, write, site_inputs) in AGGREGATES.items():
+        version = aggregate_version(fields_for, render, write, site_inputs)
+        old = graph.get(name, {}).get('entries', {})
+        rerender = graph.get(name, {}).get('version') != version
+        entries = {}
+        dirty = rerender or set(old) != set(keys) or not (SITE_DIR / name).exists()
+
+        for key, input_file in sorted(keys.items()):
+            href = Path(key).with_suffix('.html').as_posix()
+            fields = fields_for(recipes[input_file], href)
+            fingerprint = content_hash(json.dumps(fields, sort_keys=True))
+            entry = old.get(key)
+            if not entry or entry['fingerprint'] != fingerprint:
+                entry = {
+                    'fingerprint': fingerprint,
+                    'order': fields.get('title', href).lower(),
+                    'updated': today,
+                    'fragment': render(fields, today),
+                }
+                dirty = True
+            elif rerender:
+                entry = dict(entry, fragment=render(fields, entry['updated']))
+            entries[key] = entry
+
+        if dirty and write(sorted(entries.values(), key=lambda entry: entry['order'])):
+            regenerated.append(name)
+        graph[name] = {'version': version, 'entries': entries}
+
+    write_if_changed(graph_file, json.dumps(graph, indent=1) + '\n')
+    return regenerated
+
+def validate_cooklang(content):
+    """List problems in a .cook file that would break or silently drop content."""
+    problems = []
+    current_section = None
+    for number, line in enumerate(content.split('\n'), 1):
+        if line.startswith('>>'):
+            if ':' not in line:
+                problems.append(f"line {number}: metadata without ':'")
+        elif line.startswith('## '):
+            current_section = line[3:].strip()
+            if current_section not in KNOWN_SECTIONS:
+                problems.append(f"line {number}: unknown section '{current_section}'")
+        elif current_section == "Tools" and line.strip() and not TOOL_PATTERN.search(line):
+            problems.append(f"line {number}: tool without #name{{}} markup")
+    if problems:
+        return problems
+
+    recipe_data = parse_cooklang(content)
+    if 'title' not in recipe_data['metadata']:
+        problems.append("missing title")
+    if not recipe_data['ingredients']:
+        problems.append("no ingredients")
+    if not recipe_data['steps']:
+        problems.append("no instructions")
+    return problems
+
+def parse_quantity(text):
+    """Parse one quantity ("2", "1.5", "1/4", "1 1/2") as a Fraction, or None."""
+    match = QUANTITY_PATTERN.fullmatch(text.strip())
+    if not match or match.group(3) and int(match.group(3)) == 0:
+        return None
+    whole, number, denominator = match.groups()
+    value = Fraction(number) / int(denominator or 1)
+    return value + int(whole or 0)
+
+def format_quantity(value):
+    """Format a scaled quantity, keeping kitchen fractions where they are close enough."""
+    fraction = value.limit_denominator(8)
+    if fraction.denominator not in (1, 2, 3, 4, 8) or abs(fraction - value) > value / 100:
+        return f"{float(value):.2f}".rstrip('0').rstrip('.')
+    whole, rest = divmod(fraction.numerator, fraction.denominator)
+    if not rest:
+        return str(whole)
+    return f"{whole} {rest}/{fraction.denominator}" if whole else f"{rest}/{fraction.denominator}"
+
+def scale_quantity(quantity, factor):
+    """Scale a quantity or a "low-high" range; text that is not a number is left as is."""
+    values = [parse_quantity(part) for part in quantity.split('-')]
+    if not quantity.strip() or len(values) > 2 or None in values:
+        return quantity
+    return '-'.join(format_quantity(value * factor) for value in values)
+
+def scale_factor(value):
+    """`value` as a Fraction; ValueError unless it is a positive number."""
+    try:
+        factor = Fraction(str(value))
+    except (ValueError, ZeroDivisionError):
+        factor = None
+    if factor is None or factor <= 0:
+        raise ValueError(f"scale factor must be a positive number, got {value!r}")
+    return factor
+
+def scale_cooklang(content, factor):
+    """Return the .cook content with every ingredient quantity and the servings multiplied by `factor`."""
+    factor = scale_factor(factor)
+
+    def scale_ingredient(match):
+        quantity, _, unit = match.group(2).partition('%')
+        scaled = scale_quantity(quantity, factor)
+        if '%' in match.group(2):
+            scaled += '%' + unit
+        notes = f"{{{match.group(3)}}}" if match.group(3) is not None else ""
+        return f"@{match.group(1)}{{{scaled}}}{notes}"
+
+    lines = []
+    current_section = None
+    for line in content.split('\n'):
+        if line.startswith('>>'):
+            key, _, value = line[2:].partition(':')
+            match = SERVINGS_PATTERN.match(value.strip())
+            if key.strip() == 'servings' and match:
+                line = f">>{key}: {scale_quantity(match.group(1), factor)}{match.group(2)}"
+        elif line.startswith('## '):
+            current_section = line[3:].strip()
+        elif current_section == "Ingredients":
+            line = INGREDIENT_PATTERN.sub(scale_ingredient, line)
+        lines.append(line)
+    return '\n'.join(lines)
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_cached(content):
+    """parse_cooklang with results kept warm across worker requests; treat as read-only."""
+    return parse_cooklang(content)
+
+def request_content(request):
+    """CookLang source of a worker request, given inline or as a path."""
+    if 'content' in request:
+        return request['content']
+    with open(request['path'], 'r', encoding='utf-8') as f:
+        return f.read()
+
+def worker_parse(request):
+    return parse_cached(request_content(request))
+
+_related_cache = {'mtime': None, 'entries': {}}
+
+def cached_related_entries():
+    """RELATED_CACHE entries from the last build, reloaded only when the file changes."""
+    cache_file = SITE_DIR / RELATED_CACHE
+    mtime = cache_file.stat().st_mtime if cache_file.exists() else None
+    if mtime != _related_cache['mtime']:
+        entries = {}
+        if mtime is not None:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                entries = json.load(f).get('recipes', {})
+        _related_cache.update(mtime=mtime, entries=entries)
+    return _related_cache['entries']
+
+def worker_render(request):
+    recipe_data = parse_cached(request_content(request))
+    if 'path' in request:
+        # Same related links as the last build wrote for this page
+        recipe_data = dict(recipe_data, related=related_links(request['path'], cached_related_entries()))
+    stem = Path(request.get('path', 'recipe')).stem
+    return {'html': generate_html(recipe_data, stem)}
+
+def worker_validate(request):
+    problems = validate_cooklang(request_content(request))
+    return {'valid': not problems, 'problems': problems}
+
+def worker_scale(request):
+    content = scale_cooklang(request_content(request), request['factor'])
+    return {'content': content, 'ingredients': parse_cached(content)['ingredients']}
+
+WORKER_OPS = {
+    'parse': worker_parse,
+    'render': worker_render,
+    'validate': worker_validate,
+    'scale': worker_scale,
+}
+
+def handle_request(line):
+    """Run one JSON-lines request and return the response object."""
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        return {'id': None, 'ok': False, 'error': f"invalid JSON: {e}"}
+    if not isinstance(request, dict):
+        return {'id': None, 'ok': False, 'error': "request must be a JSON object"}
+
+    request_id = request.get('id')
+    op = WORKER_OPS.get(request.get('op'))
+    if op is None:
+        return {'id': request_id, 'ok': False, 'error': f"unknown op {request.get('op')!r}"}
+    if 'content' not in request and 'path' not in request:
+        return {'id': request_id, 'ok': False, 'error': "request needs 'content' or 'path'"}
+    if op is worker_scale and 'factor' not in request:
+        return {'id': request_id, 'ok': False, 'error': "scale request needs a 'factor'"}
+    try:
+        return {'id': request_id, 'ok': True, 'result': op(request)}
+    except Exception as e:  # report per request; the worker keeps serving
+        return {'id': request_id, 'ok': False, 'error': f"{type(e).__name__}: {e}"}
+
+def run_worker(stdin=None, stdout=None):
+    """Serve JSON-lines requests until stdin closes.
+
+    Each request is {"id": ..., "op": "parse" | "render" | "validate" |
+    "scale", "content": ... and/or "path": ...} (scale also takes "factor").
+    render adds the related links from the last build when a path is
+    given; with content alone it is a preview without them.
+    Requests can be pipelined: they are handled concurrently and each
+    response echoes the request id, so responses may arrive out of order.
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    lock = threading.Lock()
+
+    def respond(line):
+        response = json.dumps(handle_request(line), ensure_ascii=False)
+        with lock:
+            stdout.write(response + '\n')
+            stdout.flush()
+
+    with ThreadPoolExecutor(max_workers=WORKER_THREADS) as executor:
+        for line in stdin:
+            if line.strip():
+                executor.submit(respond, line)
+
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python cooklang_to_html.py recipe.cook")
-        print("Output: recipe.html")
+        print("Usage: python cooklang_to_html.py recipe.cook [more.cook ...]")
+        print("       python cooklang_to_html.py --worker")
+        print("Output: recipe.html, precache-manifest.json, sw.js")
         sys.exit(1)
     
-    input_file = Path(sys.argv[1])
+    if sys.argv[1] == '--worker':
+        sys.stdin.reconfigure(encoding='utf-8')
+        sys.stdout.reconfigure(encoding='utf-8')
+        run_worker()
+        return
     
-    if not input_file.exists():
-        print(f"Error: File '{input_file}' not found")
-        sys.exit(1)
+    input_files = [Path(arg) for arg in sys.argv[1:]]
     
-    # Read CookLang file
-    with open(input_file, 'r', encoding='utf-8') as f:
-        content = f.read()
+    for input_file in input_files:
+        if not input_file.exists():
+            print(f"Error: File '{input_file}' not found")
+            sys.exit(1)
     
-    # Parse recipe
-    recipe_data = parse_cooklang(content)
+    # Read and parse every recipe first; related links need the whole set
+    recipes = {}
+    for input_file in input_files:
+        with open(input_file, 'r', encoding='utf-8') as f:
+            recipes[input_file] = parse_cooklang(f.read())
+    
+    # Related links; pages of other recipes whose links changed are rebuilt too
+    rebuild = set(input_files) | add_related(recipes)
     
-    # Generate HTML
-    html = generate_html(recipe_data, input_file.stem)
+    pages = {}
+    for input_file, recipe_data in recipes.items():
+        if input_file not in rebuild:
+            continue
+        
+        # Generate HTML
+        html = generate_html(recipe_data, input_file.stem)
+        
+        # Write output, leaving unchanged pages untouched
+        output_file = input_file.with_suffix('.html')
+        if write_if_changed(output_file, html):
+            print(f"✅ Converted {input_file} → {output_file}")
+        else:
+            print(f"✔️  {output_file} is up to date")
+        pages[output_file] = html
+        
+        print(f"📊 Ingredients: {len(recipe_data['ingredients'])}")
+        print(f"🔧 Tools: {len(recipe_data['tools'])}")
+        print(f"📝 Steps: {len(recipe_data['steps'])}")
     
-    # Write output
-    output_file = input_file.with_suffix('.html')
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html)
+    # Card grid, sitemap and feed, only where the fields they use changed
+    regenerated = update_aggregates(recipes)
+    if regenerated:
+        print(f"🗂️  Regenerated: {', '.join(regenerated)}")
     
-    print(f"✅ Converted {input_file} → {output_file}")
-    print(f"📊 Ingredients: {len(recipe_data['ingredients'])}")
-    print(f"🔧 Tools: {len(recipe_data['tools'])}")
-    print(f"📝 Steps: {len(recipe_data['steps'])}")
+    # Precache manifest and service worker
+    manifest, changed = write_precache(pages)
+    status = "updated" if changed else "unchanged"
+    print(f"📦 Precache: {len(manifest)} files ({status})")
 
 if __name__ == "__main__":
     main()
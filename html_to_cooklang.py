@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+HTML to CookLang Recipe Importer
+Converts hand-written or scraped recipe pages back into .cook files
+"""
+
+import argparse
+import os
+import sys
+from html.parser import HTMLParser
+from multiprocessing import Pool
+from pathlib import Path
+
+from cooklang_to_html import parse_cooklang
+
+# Pages are fed to the parser in chunks so a worker never holds a whole page
+CHUNK_SIZE = 64 * 1024
+# Cap on a single extracted field (one ingredient, one step, ...)
+MAX_FIELD_CHARS = 20000
+# Recycle workers periodically so long imports keep a flat memory profile
+MAX_TASKS_PER_CHILD = 500
+
+# CSS classes used by generate_html, mapped to the recipe field they hold
+CONTAINER_CLASSES = {
+    'ingredients-list': 'ingredients',
+    'instructions-list': 'steps',
+    'recipe-notes': 'tips',
+    'portioning-guide': 'portioning_guide',
+    'ingredient-group': 'ingredient_group',
+}
+
+# Elements captured as a single item inside each container
+ITEM_TAGS = {
+    'ingredients': ('li',),
+    'steps': ('li',),
+    'tips': ('li', 'p'),
+    'portioning_guide': ('p',),
+}
+
+# Stat labels in the recipe header, mapped to CookLang metadata keys
+STAT_KEYS = {
+    'prep time': 'prep_time',
+    'cook time': 'cook_time',
+    'total time': 'time',
+    'servings': 'servings',
+}
+
+# Start tags that implicitly close an open <p> (HTML spec, "in body" insertion mode)
+P_CLOSING_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'details', 'dialog', 'div', 'dl',
+    'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4',
+    'h5', 'h6', 'header', 'hgroup', 'hr', 'main', 'menu', 'nav', 'ol', 'p', 'pre',
+    'section', 'summary', 'table', 'ul',
+}
+
+# Elements that stop the search for an open <p> to close
+P_SCOPE_BOUNDARIES = {'applet', 'button', 'caption', 'html', 'marquee', 'object', 'table', 'td', 'th'}
+
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr',
+}
+
+
+class RecipePageParser(HTMLParser):
+    """Stream a recipe page and collect the fields generate_html renders."""
+
+    def __init__(self):
+        super().__init__()
+        self.title = ""
+        self.page_title = ""
+        self.intro = ""
+        self.stats = []
+        self.ingredients = []
+        self.steps = []
+        self.tips = []
+        self.portioning_guide = []
+        self.issues = []
+
+        self._stack = []        # open elements as (tag, container or None)
+        self._containers = []   # open recipe containers, innermost last
+        self._capture = None    # field currently being collected
+        self._stat_label = None
+
+    def _start_capture(self, field, tag, markup=True):
+        self._capture = {
+            'field': field,
+            'tag': tag,
+            'level': len(self._stack),
+            'markup': markup,
+            'parts': [],
+            'size': 0,
+        }
+
+    def _append(self, text):
+        capture = self._capture
+        if capture['size'] + len(text) > MAX_FIELD_CHARS:
+            if capture['size'] <= MAX_FIELD_CHARS:
+                self.issues.append(f"{capture['field']} entry truncated at {MAX_FIELD_CHARS} characters"
+                                   " (unclosed tag?)")
+                capture['size'] = MAX_FIELD_CHARS + 1
+            return
+        capture['parts'].append(text)
+        capture['size'] += len(text)
+
+    def _finish_capture(self):
+        capture = self._capture
+        self._capture = None
+        value = ' '.join(''.join(capture['parts']).split())
+        field = capture['field']
+
+        if field == 'title':
+            if not self.title:
+                self.title = value
+        elif field == 'page_title':
+            self.page_title = value
+        elif field == 'intro':
+            self.intro = value
+        elif field == 'stat_label':
+            self._stat_label = value
+        elif field == 'stat_value':
+            self.stats.append((self._stat_label or "", value))
+            self._stat_label = None
+        elif value:
+            getattr(self, field).append(value)
+
+    def _in_nested_list(self):
+        """True if a list was opened inside the element being captured."""
+        return any(tag in ('ul', 'ol') for tag, _ in self._stack[self._capture['level']:])
+
+    def _close_to(self, level):
+        """Pop open elements until only `level` remain."""
+        while len(self._stack) > level:
+            tag, container = self._stack.pop()
+            if container:
+                self._containers.pop()
+            if self._capture and len(self._stack) < self._capture['level']:
+                self._finish_capture()
+            elif self._capture and self._capture['markup']:
+                # Keep captured markup balanced, including implicitly closed tags
+                self._append(f'</{tag}>')
+
+    def _close_open_paragraph(self):
+        """Close an open <p> in scope, as a block-level start tag does in HTML."""
+        for index in range(len(self._stack) - 1, -1, -1):
+            tag = self._stack[index][0]
+            if tag == 'p':
+                self._close_to(index)
+                return
+            if tag in P_SCOPE_BOUNDARIES:
+                return
+
+    def handle_starttag(self, tag, attrs):
+        classes = (dict(attrs).get('class') or '').split()
+
+        # An open <li> is implicitly closed by its next sibling, an open <p> by any block
+        if (self._capture and tag == self._capture['tag'] == 'li'
+                and not self._in_nested_list()):
+            self._close_to(self._capture['level'] - 1)
+        if tag in P_CLOSING_TAGS:
+            self._close_open_paragraph()
+
+        started = None
+        if self._capture:
+            if self._capture['markup']:
+                self._append(self.get_starttag_text())
+        else:
+            field = None
+            container = self._containers[-1] if self._containers else None
+            if tag == 'h1':
+                field = 'title'
+            elif tag == 'title':
+                field = 'page_title'
+            elif 'recipe-intro' in classes:
+                field = 'intro'
+            elif 'stat-label' in classes:
+                field = 'stat_label'
+            elif 'stat-value' in classes:
+                field = 'stat_value'
+            elif container in ITEM_TAGS and tag in ITEM_TAGS[container]:
+                field = container
+            elif container == 'ingredient_group' and tag in ('h2', 'h3', 'h4'):
+                self.issues.append("ingredient group headings dropped")
+
+            if field:
+                markup = field == 'intro' or field in ITEM_TAGS
+                self._start_capture(field, tag, markup)
+                started = self._capture
+
+        if tag in VOID_TAGS:
+            return
+
+        container = next((CONTAINER_CLASSES[c] for c in classes if c in CONTAINER_CLASSES), None)
+        if container:
+            self._containers.append(container)
+        self._stack.append((tag, container))
+        if started:
+            # Capture ends once the captured element itself is popped
+            started['level'] = len(self._stack)
+
+    def handle_endtag(self, tag):
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index][0] == tag:
+                break
+        else:
+            return  # stray end tag
+        self._close_to(index)
+
+    def handle_data(self, data):
+        if not self._capture:
+            return
+        if self._capture['markup']:
+            data = data.replace('<', '&lt;').replace('>', '&gt;')
+        self._append(data)
+
+    def close(self):
+        super().close()
+        if self._capture:
+            self.issues.append(f"{self._capture['field']} entry not closed before end of page")
+        self._close_to(0)
+
+    def recipe_data(self):
+        """Return the extracted fields in the shape parse_cooklang produces."""
+        metadata = {}
+        title = self.title or self.page_title.split(' - ')[0].strip()
+        if title:
+            metadata['title'] = title
+
+        for label, value in self.stats:
+            key = STAT_KEYS.get(label.lower())
+            if not key:
+                self.issues.append(f"unrecognised stat '{label}'")
+            elif key in metadata:
+                self.issues.append(f"duplicate stat '{label}'")
+            elif value:
+                metadata[key] = value
+
+        return {
+            'metadata': metadata,
+            'intro': self.intro,
+            'portioning_guide': self.portioning_guide,
+            'ingredients': self.ingredients,
+            'tools': [],
+            'steps': self.steps,
+            'tips': self.tips,
+        }
+
+
+def extract_recipe(path):
+    """Stream an HTML page through RecipePageParser and return (recipe_data, issues)."""
+    parser = RecipePageParser()
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.feed(chunk)
+    parser.close()
+    recipe_data = parser.recipe_data()
+    return recipe_data, parser.issues
+
+
+def to_cooklang(recipe_data):
+    """Serialise extracted recipe data as a .cook file."""
+    meta = recipe_data['metadata']
+    lines = [f"# {meta.get('title', 'Recipe')}", ""]
+
+    for key in ('time', 'servings', 'prep_time', 'cook_time'):
+        if key in meta:
+            lines.append(f">> {key}: {meta[key]}")
+    if len(lines) > 2:
+        lines.append("")
+
+    if recipe_data['intro']:
+        lines += [recipe_data['intro'], ""]
+
+    if recipe_data['portioning_guide']:
+        lines += ["## Portioning Guide", ""]
+        lines += recipe_data['portioning_guide']
+        lines.append("")
+
+    lines += ["## Ingredients", ""]
+    lines += [f"- {ingredient}" for ingredient in recipe_data['ingredients']]
+    lines.append("")
+
+    lines += ["## Instructions", ""]
+    for step in recipe_data['steps']:
+        lines += [step, ""]
+
+    if recipe_data['tips']:
+        lines += ["## Tips", ""]
+        lines += [f"- {tip}" for tip in recipe_data['tips']]
+        lines.append("")
+
+    return '\n'.join(lines)
+
+
+def round_trip_issues(recipe_data, content):
+    """List the fields that parse_cooklang does not read back unchanged."""
+    parsed = parse_cooklang(content)
+    issues = []
+    for key, value in recipe_data['metadata'].items():
+        if parsed['metadata'].get(key) != value:
+            issues.append(f"{key} does not round-trip")
+    for field in ('intro', 'portioning_guide', 'ingredients', 'steps', 'tips'):
+        if parsed[field] != recipe_data[field]:
+            issues.append(f"{field.replace('_', ' ')} do not round-trip")
+    return issues
+
+
+def import_page(task):
+    """Convert one HTML page to a .cook file; runs inside a worker process."""
+    html_file, cook_file, force = task
+    result = {'page': str(html_file), 'output': str(cook_file), 'status': 'ok', 'issues': []}
+
+    try:
+        if cook_file.exists() and not force:
+            result.update(status='skipped', issues=[f"{cook_file} already exists"])
+            return result
+
+        recipe_data, issues = extract_recipe(html_file)
+        if not recipe_data['ingredients'] and not recipe_data['steps']:
+            # Parser issues may explain why nothing was found (e.g. an unclosed tag)
+            result.update(status='skipped', issues=["not a recipe page"] + issues)
+            return result
+
+        if 'title' not in recipe_data['metadata']:
+            issues.append("missing title")
+        if not recipe_data['ingredients']:
+            issues.append("no ingredients")
+        if not recipe_data['steps']:
+            issues.append("no instructions")
+
+        content = to_cooklang(recipe_data)
+        issues += round_trip_issues(recipe_data, content)
+
+        cook_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(cook_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+        if issues:
+            result.update(status='partial', issues=issues)
+    except Exception as e:  # report and keep going; one bad page shouldn't stop an import
+        result.update(status='error', issues=[f"{type(e).__name__}: {e}"])
+
+    return result
+
+
+def iter_tasks(inputs, output_dir, force):
+    """Yield (html_file, cook_file, force) lazily so huge archives are never listed in full."""
+    for root in inputs:
+        root = Path(root)
+        pages = root.rglob('*.html') if root.is_dir() else [root]
+        for html_file in pages:
+            if output_dir is None:
+                cook_file = html_file.with_suffix('.cook')
+            elif root.is_dir():
+                cook_file = Path(output_dir) / html_file.relative_to(root).with_suffix('.cook')
+            else:
+                cook_file = Path(output_dir) / html_file.with_suffix('.cook').name
+            yield html_file, cook_file, force
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import recipe HTML pages as CookLang files.")
+    parser.add_argument('inputs', nargs='+', help="HTML pages or directories to scan for *.html")
+    parser.add_argument('-o', '--output-dir', help="write .cook files here instead of next to each page")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (default: CPU count)")
+    parser.add_argument('--report', help="write a tab-separated report of pages that did not map cleanly")
+    parser.add_argument('--force', action='store_true', help="overwrite existing .cook files")
+    args = parser.parse_args()
+
+    for root in args.inputs:
+        if not Path(root).exists():
+            print(f"Error: File '{root}' not found")
+            sys.exit(1)
+
+    tasks = iter_tasks(args.inputs, args.output_dir, args.force)
+    counts = {'ok': 0, 'partial': 0, 'skipped': 0, 'error': 0}
+    report = open(args.report, 'w', encoding='utf-8') if args.report else sys.stdout
+
+    def record(result):
+        counts[result['status']] += 1
+        if result['issues']:
+            report.write(f"{result['status']}\t{result['page']}\t{'; '.join(result['issues'])}\n")
+
+    try:
+        if args.jobs <= 1:
+            for task in tasks:
+                record(import_page(task))
+        else:
+            with Pool(args.jobs, maxtasksperchild=MAX_TASKS_PER_CHILD) as pool:
+                for result in pool.imap_unordered(import_page, tasks, chunksize=16):
+                    record(result)
+    finally:
+        if report is not sys.stdout:
+            report.close()
+
+    print(f"✅ Imported {counts['ok']} clean, {counts['partial']} with issues")
+    print(f"⏭️  Skipped: {counts['skipped']}")
+    print(f"❌ Errors: {counts['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -63,3 +63,10 @@ window.addEventListener('scroll', () => {
         navbar.style.boxShadow = '0 2px 4px rgba(0,0,0,0.05)';
     }
 });
+
+// Offline cache for repeat visits (sw.js is generated by cooklang_to_html.py)
+if ('serviceWorker' in navigator) {
+    window.addEventListener('load', () => {
+        navigator.serviceWorker.register('sw.js');
+    });
+}
@@ -0,0 +1,75 @@
+// Generated by cooklang_to_html.py from precache-manifest.json. Do not edit by hand.
+const CACHE_NAME = 'recipes-precache';
+const HASHES_KEY = '__precache-hashes__';
+const MANIFEST = {
+  "cooking.html": "abfdc329734985b3",
+  "index.html": "f669e263cbea26a5",
+  "risotto-ai-funghi.html": "dc63a783285cbdd2",
+  "script.js": "b5c59e7b15a8ff29",
+  "styles.css": "75aeb7c6e13b9931"
+};
+
+const toUrl = path => new URL(path, self.registration.scope).href;
+
+// Fetch only the entries whose content hash differs from what is already cached
+async function refreshChanged() {
+    const cache = await caches.open(CACHE_NAME);
+    const stored = await cache.match(HASHES_KEY);
+    const hashes = stored ? await stored.json() : {};
+
+    await Promise.all(Object.entries(MANIFEST).map(async ([path, hash]) => {
+        if (hashes[path] === hash && await cache.match(toUrl(path))) {
+            return;
+        }
+        const response = await fetch(toUrl(path), { cache: 'reload' });
+        if (response.ok) {
+            await cache.put(toUrl(path), response);
+            hashes[path] = hash;
+        }
+    }));
+
+    for (const path of Object.keys(hashes)) {
+        if (!(path in MANIFEST)) {
+            delete hashes[path];
+            await cache.delete(toUrl(path));
+        }
+    }
+    await cache.put(HASHES_KEY, new Response(JSON.stringify(hashes)));
+}
+
+self.addEventListener('install', event => {
+    // Runs in the background while the previous worker keeps serving pages
+    event.waitUntil(refreshChanged().then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(self.clients.claim());
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET' || !request.url.startsWith(self.registration.scope)) {
+        return;
+    }
+
+    let path = new URL(request.url).pathname.slice(new URL(self.registration.scope).pathname.length);
+    if (path === '') {
+        path = 'index.html';
+    }
+    if (!(path in MANIFEST)) {
+        return;
+    }
+
+    // Cache first; changed entries are refreshed when a new worker installs
+    event.respondWith(caches.open(CACHE_NAME).then(async cache => {
+        const cached = await cache.match(toUrl(path));
+        if (cached) {
+            return cached;
+        }
+        const response = await fetch(request);
+        if (response.ok) {
+            cache.put(toUrl(path), response.clone());
+        }
+        return response;
+    }));
+});
@@ -0,0 +1,308 @@
+import json
+import random
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+import cooklang_to_html
+from cooklang_to_html import (
+    find_related, lsh_bands, lsh_candidates, parse_cooklang, recipe_features, scale_cooklang,
+)
+from html_to_cooklang import extract_recipe, import_page
+
+RECIPE = """# Test
+
+## Ingredients
+
+- @eggs{{{eggs}}}
+- @olive oil{{{oil}%tbsp}}{{high quality}}
+- @salt{{}}{{pinch}}
+- @flour{{a few%handfuls}}
+
+## Instructions
+
+Mix.
+"""
+
+
+def test_scale_mixed_number():
+    scaled = scale_cooklang(RECIPE.format(eggs='1 1/2', oil='2'), 3)
+    assert parse_cooklang(scaled)['ingredients'][0] == '4 1/2 eggs'
+
+
+def test_scale_range_keeps_both_ends():
+    scaled = scale_cooklang(RECIPE.format(eggs='1', oil='2-3'), 0.333)
+    assert parse_cooklang(scaled)['ingredients'][1] == '2/3-1 tbsp olive oil, high quality'
+
+
+def test_scale_leaves_unquantified_ingredients_alone():
+    scaled = scale_cooklang(RECIPE.format(eggs='1', oil='2'), 2)
+    assert parse_cooklang(scaled)['ingredients'][2:] == ['salt, pinch', 'a few handfuls flour']
+
+
+def test_scale_twice_matches_scaling_once():
+    once = scale_cooklang(RECIPE.format(eggs='1/2', oil='1 1/2-2'), 6)
+    twice = scale_cooklang(scale_cooklang(RECIPE.format(eggs='1/2', oil='1 1/2-2'), 3), 2)
+    assert parse_cooklang(twice)['ingredients'] == parse_cooklang(once)['ingredients']
+    assert parse_cooklang(twice)['ingredients'][:2] == ['3 eggs', '9-12 tbsp olive oil, high quality']
+
+
+def test_scale_down_and_back_up():
+    halved = scale_cooklang(RECIPE.format(eggs='3', oil='1 1/2'), 0.5)
+    assert parse_cooklang(halved)['ingredients'][:2] == ['1 1/2 eggs', '3/4 tbsp olive oil, high quality']
+    restored = scale_cooklang(halved, 2)
+    assert parse_cooklang(restored)['ingredients'][:2] == ['3 eggs', '1 1/2 tbsp olive oil, high quality']
+
+
+@pytest.mark.parametrize('servings, factor, expected', [
+    ('4', 1.5, '6'),
+    ('1-2', 2, '2-4'),
+    ('4 people', 0.5, '2 people'),
+    ('a crowd', 2, 'a crowd'),
+])
+def test_scale_servings(servings, factor, expected):
+    scaled = scale_cooklang(f">> servings: {servings}\n" + RECIPE.format(eggs='1', oil='2'), factor)
+    assert parse_cooklang(scaled)['metadata']['servings'] == expected
+
+
+@pytest.mark.parametrize('factor', [0, -1, 'two', '1/0'])
+def test_scale_rejects_non_positive_factor(factor):
+    with pytest.raises(ValueError, match='positive number'):
+        scale_cooklang(RECIPE.format(eggs='1', oil='2'), factor)
+
+
+def test_worker_scale_checks_factor():
+    request = {'id': 1, 'op': 'scale', 'content': RECIPE.format(eggs='4', oil='5')}
+    assert cooklang_to_html.handle_request(json.dumps(request)) == {
+        'id': 1, 'ok': False, 'error': "scale request needs a 'factor'"}
+    response = cooklang_to_html.handle_request(json.dumps(dict(request, factor=-1)))
+    assert not response['ok'] and 'positive number' in response['error']
+    response = cooklang_to_html.handle_request(json.dumps(dict(request, factor=0.5)))
+    assert response['ok'] and response['result']['ingredients'][0] == '2 eggs'
+
+
+SITE = Path(__file__).resolve().parent
+
+
+def write_page(tmp_path, body):
+    page = tmp_path / 'page.html'
+    page.write_text(f"<html><body>{body}</body></html>", encoding='utf-8')
+    return page
+
+
+def test_import_roast_chicken_page(tmp_path):
+    recipe_data, issues = extract_recipe(SITE / 'recipe-roast-chicken.html')
+    assert issues == []
+    assert recipe_data['metadata'] == {
+        'title': 'Perfect Roast Chicken',
+        'prep_time': '15 minutes',
+        'cook_time': '1 hour 15 min',
+        'time': '1.5 hours',
+        'servings': '4 people',
+    }
+    assert len(recipe_data['ingredients']) == 8
+    assert recipe_data['ingredients'][0] == '1 whole chicken (3.5-4 lbs), giblets removed'
+    assert len(recipe_data['steps']) == 8
+    assert recipe_data['steps'][2] == '<strong>Preheat your oven to 425°F (220°C).</strong> You want it hot.'
+    assert len(recipe_data['tips']) == 4
+
+    cook_file = tmp_path / 'recipe-roast-chicken.cook'
+    result = import_page((SITE / 'recipe-roast-chicken.html', cook_file, False))
+    assert result['status'] == 'ok', result['issues']
+    parsed = parse_cooklang(cook_file.read_text(encoding='utf-8'))
+    for field in ('intro', 'ingredients', 'steps', 'tips'):
+        assert parsed[field] == recipe_data[field]
+
+
+def test_import_keeps_existing_cook_file(tmp_path):
+    cook_file = tmp_path / 'recipe-roast-chicken.cook'
+    cook_file.write_text("# Mine\n", encoding='utf-8')
+    result = import_page((SITE / 'recipe-roast-chicken.html', cook_file, False))
+    assert result['status'] == 'skipped'
+    assert cook_file.read_text(encoding='utf-8') == "# Mine\n"
+
+
+def test_import_unclosed_tags(tmp_path):
+    page = write_page(tmp_path, """
+        <div class="recipe-header"><h1>Soup</h1>
+        <p class="recipe-intro">A warm soup.
+        <div class="recipe-stats"><span class="stat-label">Servings</span><span class="stat-value">2</span></div></div>
+        <ul class="ingredients-list"><li>1 onion<li>2 cups <b>stock</ul>
+        <ol class="instructions-list"><li><p>Chop.<li>Simmer.</ol>
+    """)
+    recipe_data, issues = extract_recipe(page)
+    assert issues == []
+    assert recipe_data['intro'] == 'A warm soup.'
+    assert recipe_data['metadata'] == {'title': 'Soup', 'servings': '2'}
+    assert recipe_data['ingredients'] == ['1 onion', '2 cups <b>stock</b>']
+    assert recipe_data['steps'] == ['<p>Chop.</p>', 'Simmer.']
+
+
+def test_import_reports_capture_running_to_end_of_page(tmp_path):
+    page = tmp_path / 'page.html'
+    page.write_text('<h1>Soup</h1><ol class="instructions-list"><li>Simmer', encoding='utf-8')
+    recipe_data, issues = extract_recipe(page)
+    assert recipe_data['steps'] == ['Simmer']
+    assert issues == ["steps entry not closed before end of page"]
+
+
+def test_import_reports_truncated_field(tmp_path):
+    page = write_page(tmp_path, '<span class="recipe-intro">' + 'word ' * 5000 + '<ul class="ingredients-list"><li>salt</li></ul>')
+    result = import_page((page, tmp_path / 'page.cook', False))
+    assert result['status'] == 'skipped'
+    assert any('truncated' in issue for issue in result['issues'])
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    """A copy of the site in tmp_path, with the build pointed at it."""
+    for name in ('index.html', 'cooking.html', 'styles.css', 'script.js', 'risotto-ai-funghi.cook'):
+        shutil.copy(SITE / name, tmp_path / name)
+    monkeypatch.setattr(cooklang_to_html, 'SITE_DIR', tmp_path)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def build(monkeypatch, *cook_files):
+    monkeypatch.setattr(sys, 'argv', ['cooklang_to_html.py', *cook_files])
+    cooklang_to_html.main()
+
+
+def snapshot(site, *names):
+    return {name: ((site / name).read_bytes(), (site / name).stat().st_mtime_ns) for name in names}
+
+
+def test_noop_rebuild_keeps_manifest_and_pages(site, monkeypatch):
+    build(monkeypatch, 'risotto-ai-funghi.cook')
+    outputs = ('precache-manifest.json', 'sw.js', 'risotto-ai-funghi.html')
+    before = snapshot(site, *outputs)
+    build(monkeypatch, 'risotto-ai-funghi.cook')
+    assert snapshot(site, *outputs) == before
+
+
+def test_manifest_only_changes_edited_page(site, monkeypatch):
+    build(monkeypatch, 'risotto-ai-funghi.cook')
+    before = json.loads((site / 'precache-manifest.json').read_text(encoding='utf-8'))
+    cook_file = site / 'risotto-ai-funghi.cook'
+    cook_file.write_text(cook_file.read_text(encoding='utf-8').replace('until fragrant', 'until aromatic'),
+                         encoding='utf-8')
+    build(monkeypatch, 'risotto-ai-funghi.cook')
+    after = json.loads((site / 'precache-manifest.json').read_text(encoding='utf-8'))
+    assert set(after) == set(before)
+    assert [path for path in after if after[path] != before[path]] == ['risotto-ai-funghi.html']
+
+
+def test_step_edit_leaves_aggregates_untouched(site, monkeypatch):
+    build(monkeypatch, 'risotto-ai-funghi.cook')
+    aggregates = ('cooking.html', 'sitemap.xml', 'feed.xml', '.build-graph.json')
+    before = snapshot(site, *aggregates)
+    page = (site / 'risotto-ai-funghi.html').read_text(encoding='utf-8')
+    cook_file = site / 'risotto-ai-funghi.cook'
+    cook_file.write_text(cook_file.read_text(encoding='utf-8').replace('until fragrant', 'until aromatic'),
+                         encoding='utf-8')
+    build(monkeypatch, 'risotto-ai-funghi.cook')
+    assert snapshot(site, *aggregates) == before
+    assert (site / 'risotto-ai-funghi.html').read_text(encoding='utf-8') != page
+
+
+STAPLES = ['salt', 'olive oil', 'black pepper', 'garlic', 'butter']
+
+
+def synthetic_features(count, seed):
+    """Feature sets for recipes with a few staples plus Zipf-distributed ingredients."""
+    rng = random.Random(seed)
+    names = [f"{a} {b}{c}" for a in ('spice', 'herb', 'root', 'leaf')
+             for b in 'abcdefghijklmnopqrst' for c in 'abcdefghijklmnopqrstuvwxy'][:2000]
+    weights = [1 / rank for rank in range(1, len(names) + 1)]
+    recipes = {}
+    for index in range(count):
+        ingredients = set(rng.choices(names, weights, k=rng.randint(6, 10)))
+        ingredients |= set(rng.sample(STAPLES, rng.randint(0, len(STAPLES))))
+        recipe_data = {'ingredients': sorted(ingredients), 'tools': ['pan', 'dutch oven'][:rng.randint(0, 2)]}
+        recipes[f"r{seed}-{index:05}.cook"] = recipe_features(recipe_data)
+    return recipes
+
+
+def test_staples_are_not_features():
+    recipe_data = {'ingredients': ['pinch salt', '2 tbsp olive oil', '1 small shallot, chopped'],
+                   'tools': ['pan', 'dutch oven']}
+    assert recipe_features(recipe_data) == {'ingredient:shallot', 'tool:dutch oven'}
+
+
+def test_incremental_related_matches_full_rebuild():
+    rng = random.Random(7)
+    recipes = synthetic_features(200, seed=1)
+    cache = find_related(recipes, {})
+    extra = iter(synthetic_features(40, seed=2).items())
+
+    for _ in range(30):
+        recipes = dict(recipes)
+        keys = sorted(recipes)
+        action = rng.choice(['copy', 'drop', 'add', 'remove'])
+        key = rng.choice(keys)
+        if action == 'copy':
+            # Make a recipe nearly identical to another, so it enters that recipe's lists
+            recipes[key] = recipes[rng.choice(keys)] | {'ingredient:saffron'}
+        elif action == 'drop' and recipes[key]:
+            recipes[key] = recipes[key] - {sorted(recipes[key])[0]}
+        elif action == 'add':
+            recipes.update([next(extra)])
+        else:
+            del recipes[key]
+        cache = find_related(recipes, cache)
+        assert cache == find_related(recipes, {})
+
+
+def test_lsh_candidates_stay_a_small_fraction_of_the_corpus():
+    fractions = {}
+    for count in (250, 1000):
+        entries = find_related(synthetic_features(count, seed=3), {})['recipes']
+        buckets = {}
+        for key, entry in entries.items():
+            for band in lsh_bands(entry['signature']):
+                buckets.setdefault(band, []).append(key)
+        sizes = [len(lsh_candidates(key, entry['signature'], buckets)) for key, entry in entries.items()]
+        fractions[count] = sum(sizes) / len(sizes) / count
+    # All-pairs comparison would be a fraction of 1; staples alone used to make it ~0.35
+    assert fractions[250] < 0.02
+    assert fractions[1000] < 0.02
+
+
+def test_renderer_change_rewrites_aggregates(site, monkeypatch):
+    build(monkeypatch, 'risotto-ai-funghi.cook')
+
+    def render_card(fields, updated):
+        return f'                <a href="{fields["href"]}">Cook this →</a>\n'
+
+    fields_for, _, write, site_inputs = cooklang_to_html.AGGREGATES['cooking.html']
+    monkeypatch.setitem(cooklang_to_html.AGGREGATES, 'cooking.html', (fields_for, render_card, write, site_inputs))
+    build(monkeypatch, 'risotto-ai-funghi.cook')
+    assert 'Cook this →' in (site / 'cooking.html').read_text(encoding='utf-8')
+
+
+def test_site_url_change_keeps_feed_dates(site, monkeypatch):
+    build(monkeypatch, 'risotto-ai-funghi.cook')
+    graph_file = site / '.build-graph.json'
+    graph = json.loads(graph_file.read_text(encoding='utf-8'))
+    for entry in graph['feed.xml']['entries'].values():
+        entry['updated'] = '2020-01-01'
+    graph_file.write_text(json.dumps(graph), encoding='utf-8')
+
+    monkeypatch.setattr(cooklang_to_html, 'SITE_URL', 'https://example.org/')
+    build(monkeypatch, 'risotto-ai-funghi.cook')
+    feed = (site / 'feed.xml').read_text(encoding='utf-8')
+    assert '<id>https://example.org/risotto-ai-funghi.html</id>' in feed
+    assert '<updated>2020-01-01T00:00:00Z</updated>' in feed
+    assert 'https://example.org/risotto-ai-funghi.html' in (site / 'sitemap.xml').read_text(encoding='utf-8')
+
+
+def test_sitemap_lists_hand_written_pages(site, monkeypatch):
+    build(monkeypatch, 'risotto-ai-funghi.cook')
+    shutil.copy(SITE / 'musing-maillard.html', site / 'musing-maillard.html')
+    build(monkeypatch, 'risotto-ai-funghi.cook')
+    sitemap = (site / 'sitemap.xml').read_text(encoding='utf-8')
+    for page in ('index.html', 'cooking.html', 'musing-maillard.html', 'risotto-ai-funghi.html'):
+        assert f"<loc>https://cristianvill.github.io/{page}</loc>" in sitemap
+    assert sitemap.count('risotto-ai-funghi.html') == 1